@@ -1,45 +1,86 @@
 # Este archivo está bajo la licencia Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International.
 # Para más información, visita: https://creativecommons.org/licenses/by-nc-sa/4.0/
 # Autor: [Ronald Schneider Hamann](https://github.com/skarious)
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+import os
+
+# Repartir los núcleos entre los workers de uvicorn para evitar la sobresuscripción.
+# Debe hacerse antes de importar las librerías que inicializan OpenMP
+# sched_getaffinity respeta los límites de CPU del contenedor; no existe en macOS
+CPU_COUNT = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+CPU_THREADS = max(1, CPU_COUNT // int(os.getenv("WEB_CONCURRENCY", "1")))
+os.environ.setdefault("OMP_NUM_THREADS", str(CPU_THREADS))
+os.environ.setdefault("MKL_NUM_THREADS", str(CPU_THREADS))
+
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-import whisper
+from faster_whisper import WhisperModel
+import ctranslate2
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import blake3
+import diskcache
 import tempfile
-import os
-from typing import List, Dict, Any
-import requests
-from pydantic import BaseModel, HttpUrl
-from fastapi.responses import JSONResponse
+import aiofiles
+from typing import List, Dict, Any, Optional
+import httpx
+from contextlib import asynccontextmanager
+from pydantic import BaseModel, ConfigDict, HttpUrl
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.encoders import jsonable_encoder
+from fastapi.utils import is_body_allowed_for_status_code
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.websockets import WebSocketState
 
 class AudioURL(BaseModel):
     url: HttpUrl
 
-    class Config:
-        schema_extra = {
-            "example": {
-                "url": "https://ejemplo.com/audio.mp3"
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "url": "https://ejemplo.com/audio.mp3"
         }
+    })
 
 class TranscriptionResponse(BaseModel):
     success: bool
     text: str
     language: str
-    file_size: int = None
-    source_url: str = None
+    file_size: Optional[int] = None
+    source_url: Optional[str] = None
 
-    class Config:
-        schema_extra = {
-            "example": {
-                "success": True,
-                "text": "Este es el texto transcrito del audio.",
-                "language": "es",
-                "file_size": 1024576,
-                "source_url": None
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "success": True,
+            "text": "Este es el texto transcrito del audio.",
+            "language": "es",
+            "file_size": 1024576,
+            "source_url": None
         }
+    })
+
+# Cliente HTTP compartido: reutiliza conexiones (y el handshake TLS) entre descargas
+http = httpx.AsyncClient(
+    http2=True,
+    timeout=60,
+    follow_redirects=True,
+    headers={"Accept-Encoding": "identity"},
+    limits=httpx.Limits(max_keepalive_connections=32),
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    encoder_batcher.start()
+    if WHISPER_WARMUP:
+        await asyncio.to_thread(_warmup)
+    yield
+    await encoder_batcher.stop()
+    await http.aclose()
 
 app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     title="API de Transcripción de Audio",
     description="""
     Esta API permite transcribir archivos de audio a texto utilizando el modelo Whisper de OpenAI.
@@ -65,6 +106,58 @@ app = FastAPI(
     },
 )
 
+# Serializar también las respuestas de error con orjson (mismo formato que los handlers de FastAPI)
+@app.exception_handler(StarletteHTTPException)
+async def http_exception_handler(request: Request, exc: StarletteHTTPException):
+    if not is_body_allowed_for_status_code(exc.status_code):
+        return Response(status_code=exc.status_code, headers=exc.headers)
+    return ORJSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers=exc.headers)
+
+@app.exception_handler(RequestValidationError)
+async def request_validation_exception_handler(request: Request, exc: RequestValidationError):
+    return ORJSONResponse(status_code=422, content={"detail": jsonable_encoder(exc.errors())})
+
+# Tamaño máximo del audio recibido, tanto subido como descargado desde una URL
+MAX_UPLOAD = int(os.getenv("MAX_UPLOAD_MB", "200")) << 20
+TOO_LARGE = {
+    "error": "El archivo es demasiado grande",
+    "tip": f"El tamaño máximo permitido es de {MAX_UPLOAD >> 20} MB"
+}
+
+class LimitUploadSize:
+    # Limitar el cuerpo de las solicitudes a nivel ASGI, antes de que FastAPI lo procese:
+    # se rechaza por Content-Length y, si no lo hay (subidas chunked), se cuentan los bytes
+    # recibidos y se corta en cuanto superan el límite, sin esperar a que el formulario
+    # multipart termine de volcarse a disco
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > MAX_UPLOAD:
+            response = ORJSONResponse(status_code=413, content={"detail": TOO_LARGE})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > MAX_UPLOAD:
+                    raise HTTPException(status_code=413, detail=TOO_LARGE)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+app.add_middleware(LimitUploadSize)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -75,10 +168,195 @@ app.add_middleware(
 )
 
 # Load the Whisper model
-model = whisper.load_model("base")
+# MODEL_SIZE permite usar modelos más grandes (medium, large-v3); la cuantización
+# int8 de CTranslate2 los mantiene utilizables en CPU con la mitad de memoria
+MODEL_SIZE = os.getenv("MODEL_SIZE", "base")
+# Usar la GPU con float16 cuando CUDA está disponible
+DEVICE = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "float16" if DEVICE == "cuda" else "int8")
+# Número de transcripciones que pueden ejecutarse a la vez
+WHISPER_CONCURRENCY = int(os.getenv("WHISPER_CONCURRENCY", "1"))
+model = WhisperModel(MODEL_SIZE, device=DEVICE, compute_type=COMPUTE_TYPE, cpu_threads=max(1, CPU_THREADS // WHISPER_CONCURRENCY), num_workers=WHISPER_CONCURRENCY)
+INFER_SEM = asyncio.Semaphore(WHISPER_CONCURRENCY)
+
+# Micro-batching del encoder entre solicitudes concurrentes: cada ventana de 30 s espera
+# hasta WHISPER_MAX_WAIT_MS a que otras transcripciones pidan también un pase del encoder
+# y se codifican juntas en una sola llamada. Solo agrupa cuando WHISPER_CONCURRENCY > 1
+WHISPER_MAX_BATCH = int(os.getenv("WHISPER_MAX_BATCH", str(WHISPER_CONCURRENCY)))
+WHISPER_MAX_WAIT_MS = float(os.getenv("WHISPER_MAX_WAIT_MS", "10"))
+
+def _encode_batch(batch):
+    # Codificar varias ventanas de mel [80, 3000] en un único pase del encoder
+    features = np.stack([f[0] if f.ndim == 3 else f for f in batch])
+    if len(batch) == 1:
+        return [_encode(features)]
+    # La salida se trae a CPU para repartirla; el decoder la acepta en cualquier dispositivo
+    output = np.array(model.model.encode(ctranslate2.StorageView.from_array(features), to_cpu=True))
+    return [ctranslate2.StorageView.from_array(np.ascontiguousarray(output[i:i + 1])) for i in range(len(batch))]
+
+class EncoderBatcher:
+    def __init__(self, max_batch, max_wait):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.loop = None
+        self.queue = None
+        self.task = None
+        # Hilo propio para el encoder: los hilos de inferencia quedan bloqueados esperando
+        # su resultado y no deben poder agotar el threadpool por defecto
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def start(self):
+        if self.max_batch > 1:
+            self.loop = asyncio.get_running_loop()
+            self.queue = asyncio.Queue()
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.wait([self.task])
+            self.loop = self.task = None
+
+    def encode(self, features):
+        # Llamado desde los hilos de inferencia de faster-whisper (WhisperModel.encode)
+        if self.loop is None:
+            return _encode(features)
+        return asyncio.run_coroutine_threadsafe(self._submit(features), self.loop).result()
+
+    async def _submit(self, features):
+        future = self.loop.create_future()
+        await self.queue.put((features, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            deadline = self.loop.time() + self.max_wait / 1000
+            while len(batch) < self.max_batch:
+                timeout = deadline - self.loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                outputs = await self.loop.run_in_executor(self.executor, _encode_batch, [f for f, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(output)
+
+_encode = model.encode
+encoder_batcher = EncoderBatcher(WHISPER_MAX_BATCH, WHISPER_MAX_WAIT_MS)
+# faster-whisper llama a self.encode para cada ventana y para detectar el idioma
+model.encode = encoder_batcher.encode
+
+# Frecuencia de muestreo esperada por Whisper
+SAMPLE_RATE = 16000
+
+def _open_audio_buffer():
+    # Guardar el audio en un archivo anónimo en memoria (memfd) en lugar de en disco;
+    # si no está disponible, usar un archivo temporal ya desvinculado
+    try:
+        return os.memfd_create("audio")
+    except (AttributeError, OSError):
+        fd, path = tempfile.mkstemp()
+        os.unlink(path)
+        return fd
+
+async def _decode_audio(fd):
+    # Decodificar con ffmpeg a PCM mono de 16 kHz, fuera del semáforo de inferencia.
+    # ffmpeg hereda el descriptor y lo reabre, por lo que la entrada sigue siendo buscable.
+    # Donde /dev/fd/N duplica el descriptor en lugar de reabrirlo (macOS), ffmpeg comparte
+    # la posición actual: volver al inicio antes de lanzarlo
+    os.lseek(fd, 0, os.SEEK_SET)
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-nostdin", "-threads", str(CPU_THREADS), "-i", f"/dev/fd/{fd}",
+        "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        pass_fds=(fd,),
+    )
+    out, err = await proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg no pudo decodificar el audio: {err.decode(errors='ignore').strip()}")
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+def _transcribe(audio):
+    # faster-whisper decodifica de forma perezosa: consumir los segmentos aquí
+    segments, info = model.transcribe(audio, beam_size=1, vad_filter=True)
+    return "".join(s.text for s in segments), info.language
+
+def _produce_segments(audio, loop, queue, stop):
+    # Recorrer el generador de segmentos en un hilo y entregarlos al event loop a medida que se generan
+    try:
+        segments, info = model.transcribe(audio, beam_size=1, vad_filter=True)
+        for segment in segments:
+            if stop.is_set():
+                return
+            loop.call_soon_threadsafe(queue.put_nowait, ("segment", segment))
+        loop.call_soon_threadsafe(queue.put_nowait, ("done", info.language))
+    except Exception as e:
+        loop.call_soon_threadsafe(queue.put_nowait, ("error", e))
+
+# Ejecutar una transcripción de prueba al iniciar para no penalizar la primera solicitud
+WHISPER_WARMUP = os.getenv("WHISPER_WARMUP", "1") == "1"
+
+def _warmup():
+    silence = np.zeros(SAMPLE_RATE * 5, dtype=np.float32)
+    # Sin VAD, para que el silencio pase por el encoder y el decoder
+    segments, _ = model.transcribe(silence, beam_size=1, vad_filter=False)
+    list(segments)
+    # Con VAD, para cargar también el modelo de detección de voz
+    _transcribe(silence)
+
+# Caché LRU en disco de transcripciones, indexada por el hash BLAKE3 del audio
+CACHE = diskcache.Cache(
+    os.getenv("WHISPER_CACHE_DIR", "/tmp/whisper-cache"),
+    size_limit=2 << 30,
+    eviction_policy="least-recently-used",
+)
+
+def _cache_key(digest):
+    return f"{MODEL_SIZE}:{COMPUTE_TYPE}:{digest}"
+
+async def _infer(fd, digest):
+    key = _cache_key(digest)
+    # diskcache usa SQLite de forma síncrona: no bloquear el event loop
+    cached = await asyncio.to_thread(CACHE.get, key)
+    if cached is not None:
+        return cached
+
+    audio = await _decode_audio(fd)
+    # La inferencia se ejecuta en un hilo para no bloquear el event loop
+    async with INFER_SEM:
+        result = await asyncio.to_thread(_transcribe, audio)
+    await asyncio.to_thread(CACHE.set, key, result)
+    return result
+
+# Tamaño de bloque para copiar el audio recibido (1 MiB)
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+def _hash_upload(src):
+    # Starlette ya volcó la subida a un SpooledTemporaryFile: forzar que tenga un archivo
+    # real (en TMPDIR) para pasarle su descriptor a ffmpeg, y hashearlo en un único hilo
+    # en lugar de copiarlo a un segundo buffer en memoria
+    src.rollover()
+    src.seek(0)
+    size = 0
+    hasher = blake3.blake3()
+    while chunk := src.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        hasher.update(chunk)
+    return size, hasher.hexdigest()
 
 @app.post("/transcribe/",
-    response_model=TranscriptionResponse,
+    responses={200: {"model": TranscriptionResponse}},
     summary="Transcribir archivo de audio",
     description="""
     Transcribe un archivo de audio a texto.
@@ -107,32 +385,93 @@ model = whisper.load_model("base")
     ```
     """)
 async def transcribe_audio(file: UploadFile = File(..., description="Archivo de audio a transcribir (MP3, WAV, M4A)")):
-    temp_file = None
     try:
-        # Leer el contenido del archivo
-        content = await file.read()
-        
-        if len(content) == 0:
+        size, digest = await asyncio.to_thread(_hash_upload, file.file)
+
+        if size == 0:
             raise HTTPException(status_code=400, detail={
                 "error": "El archivo está vacío",
                 "tip": "Asegúrate de que el archivo de audio contenga datos"
             })
+        
+        try:
+            text, language = await _infer(file.file.fileno(), digest)
             
-        # Crear archivo temporal con la extensión original
-        suffix = os.path.splitext(file.filename)[1] or '.mp3'
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-        temp_file.write(content)
-        temp_file.close()
+            return {
+                "success": True,
+                "text": text,
+                "language": language or "unknown",
+                "file_size": size,
+                "source_url": None
+            }
+        except Exception as e:
+            raise HTTPException(status_code=500, detail={
+                "error": "Error al transcribir el audio",
+                "detail": str(e),
+                "tip": "Asegúrate de que el archivo de audio no esté corrupto y sea válido"
+            })
+            
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail={
+            "error": "Error al procesar el archivo",
+            "detail": str(e),
+            "tip": "Verifica que el archivo sea válido y pueda ser leído correctamente"
+        })
+
+@app.post("/transcribe/raw",
+    responses={200: {"model": TranscriptionResponse}},
+    summary="Transcribir audio enviado como binario",
+    description="""
+    Transcribe un archivo de audio enviado directamente como datos binarios en el cuerpo de la solicitud.
+    
+    ## Ejemplo con curl
+    ```bash
+    curl -X POST http://localhost:8000/transcribe/raw \\
+      --data-binary @tuarchivo.mp3
+    ```
+    
+    ## Ejemplo con Python
+    ```python
+    import requests
+    
+    with open('audio.mp3', 'rb') as f:
+        response = requests.post('http://localhost:8000/transcribe/raw',
+                               data=f)
+        print(response.json())
+    ```
+    """)
+async def transcribe_raw(request: Request):
+    fd = None
+    try:
+        fd = _open_audio_buffer()
+
+        # Copiar el cuerpo de la solicitud por bloques sin cargarlo completo en memoria
+        size = 0
+        hasher = blake3.blake3()
+        async with aiofiles.open(fd, 'wb', closefd=False) as out:
+            async for chunk in request.stream():
+                size += len(chunk)
+                hasher.update(chunk)
+                await out.write(chunk)
+
+        if size == 0:
+            raise HTTPException(status_code=400, detail={
+                "error": "El archivo está vacío",
+                "tip": "Asegúrate de que el archivo de audio contenga datos"
+            })
         
         try:
-            result = model.transcribe(temp_file.name)
+            text, language = await _infer(fd, hasher.hexdigest())
             
-            return TranscriptionResponse(
-                success=True,
-                text=result["text"],
-                language=result.get("language", "unknown"),
-                file_size=len(content)
-            )
+            return {
+                "success": True,
+                "text": text,
+                "language": language or "unknown",
+                "file_size": size,
+                "source_url": None
+            }
         except Exception as e:
             raise HTTPException(status_code=500, detail={
                 "error": "Error al transcribir el audio",
@@ -140,6 +479,8 @@ async def transcribe_audio(file: UploadFile = File(..., description="Archivo de
                 "tip": "Asegúrate de que el archivo de audio no esté corrupto y sea válido"
             })
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail={
             "error": "Error al procesar el archivo",
@@ -147,14 +488,11 @@ async def transcribe_audio(file: UploadFile = File(..., description="Archivo de
             "tip": "Verifica que el archivo sea válido y pueda ser leído correctamente"
         })
     finally:
-        if temp_file is not None:
-            try:
-                os.unlink(temp_file.name)
-            except Exception:
-                pass
+        if fd is not None:
+            os.close(fd)
 
 @app.post("/transcribe/url",
-    response_model=TranscriptionResponse,
+    responses={200: {"model": TranscriptionResponse}},
     summary="Transcribir audio desde URL",
     description="""
     Transcribe un archivo de audio desde una URL.
@@ -182,28 +520,35 @@ async def transcribe_audio(file: UploadFile = File(..., description="Archivo de
     ```
     """)
 async def transcribe_from_url(audio: AudioURL):
-    temp_file = None
+    fd = None
     try:
-        response = requests.get(str(audio.url), stream=True)
-        response.raise_for_status()
-        
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3')
+        fd = _open_audio_buffer()
+        hasher = blake3.blake3()
         
-        for chunk in response.iter_content(chunk_size=8192):
-            if chunk:
-                temp_file.write(chunk)
-        
-        temp_file.close()
+        async with http.stream("GET", str(audio.url)) as response:
+            response.raise_for_status()
+            content_length = response.headers.get("content-length", "")
+            if content_length.isdigit() and int(content_length) > MAX_UPLOAD:
+                raise HTTPException(status_code=413, detail=TOO_LARGE)
+            size = 0
+            async with aiofiles.open(fd, 'wb', closefd=False) as out:
+                async for chunk in response.aiter_bytes(UPLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > MAX_UPLOAD:
+                        raise HTTPException(status_code=413, detail=TOO_LARGE)
+                    hasher.update(chunk)
+                    await out.write(chunk)
         
         try:
-            result = model.transcribe(temp_file.name)
+            text, language = await _infer(fd, hasher.hexdigest())
             
-            return TranscriptionResponse(
-                success=True,
-                text=result["text"],
-                language=result.get("language", "unknown"),
-                source_url=str(audio.url)
-            )
+            return {
+                "success": True,
+                "text": text,
+                "language": language or "unknown",
+                "file_size": None,
+                "source_url": str(audio.url)
+            }
         except Exception as e:
             raise HTTPException(status_code=500, detail={
                 "error": "Error al transcribir el audio",
@@ -211,7 +556,9 @@ async def transcribe_from_url(audio: AudioURL):
                 "tip": "Asegúrate de que la URL corresponda a un archivo de audio válido"
             })
             
-    except requests.RequestException as e:
+    except HTTPException:
+        raise
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=400, detail={
             "error": "Error al descargar el archivo",
             "detail": str(e),
@@ -224,11 +571,133 @@ async def transcribe_from_url(audio: AudioURL):
             "tip": "Verifica que la URL sea válida y corresponda a un archivo de audio"
         })
     finally:
-        if temp_file is not None:
+        if fd is not None:
+            os.close(fd)
+
+async def _stream_segments(websocket, audio, loop, queue, stop):
+    # Enviar cada segmento en cuanto se genera; devuelve (None, None) si el cliente se desconecta
+    async def run_producer():
+        # El semáforo se libera en cuanto termina la inferencia, aunque el cliente
+        # todavía esté recibiendo los segmentos
+        async with INFER_SEM:
+            if not stop.is_set():
+                await asyncio.to_thread(_produce_segments, audio, loop, queue, stop)
+
+    producer = asyncio.create_task(run_producer())
+    segments = []
+    try:
+        while True:
+            kind, value = await queue.get()
+            if kind == "disconnect":
+                return None, None
+            if kind == "error":
+                raise value
+            if kind == "done":
+                return segments, value
+            segment = {"text": value.text, "start": value.start, "end": value.end}
+            segments.append(segment)
+            await websocket.send_json(segment)
+    finally:
+        # Detener el hilo si el cliente se desconectó a mitad de la transcripción
+        stop.set()
+        await asyncio.wait([producer])
+
+@app.websocket("/transcribe/stream")
+async def transcribe_stream(websocket: WebSocket):
+    # El cliente envía el audio en uno o más mensajes binarios y, al terminar, un mensaje
+    # de texto cualquiera. Se responde con un JSON por segmento ({"text", "start", "end"})
+    # en cuanto Whisper lo genera y uno final con {"done": true, "language"}
+    await websocket.accept()
+    fd = None
+    try:
+        fd = _open_audio_buffer()
+
+        # Recibir el audio por bloques sin cargarlo completo en memoria
+        size = 0
+        hasher = blake3.blake3()
+        async with aiofiles.open(fd, 'wb', closefd=False) as out:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                chunk = message.get("bytes")
+                if chunk is None:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD:
+                    await websocket.send_json(TOO_LARGE)
+                    await websocket.close(code=1009)
+                    return
+                hasher.update(chunk)
+                await out.write(chunk)
+
+        if size == 0:
+            await websocket.send_json({
+                "error": "El archivo está vacío",
+                "tip": "Asegúrate de que el archivo de audio contenga datos"
+            })
+            await websocket.close(code=1003)
+            return
+
+        # Se guardan los segmentos para poder repetirlos y el texto completo para las rutas HTTP
+        key = _cache_key(hasher.hexdigest())
+        cached = await asyncio.to_thread(CACHE.get, f"segments:{key}")
+        if cached is not None:
+            segments, language = cached
+            for segment in segments:
+                await websocket.send_json(segment)
+            await websocket.send_json({"done": True, "language": language or "unknown"})
+            await websocket.close()
+            return
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stop = threading.Event()
+
+        async def watch_disconnect():
+            # Detectar la desconexión del cliente mientras el audio se decodifica, espera el
+            # semáforo o se transcribe, en lugar de esperar a que falle el siguiente envío
             try:
-                os.unlink(temp_file.name)
+                while (await websocket.receive())["type"] != "websocket.disconnect":
+                    pass
             except Exception:
                 pass
+            stop.set()
+            queue.put_nowait(("disconnect", None))
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            audio = await _decode_audio(fd)
+            if stop.is_set():
+                return
+            segments, language = await _stream_segments(websocket, audio, loop, queue, stop)
+            if segments is None:
+                return
+        finally:
+            watcher.cancel()
+
+        await asyncio.to_thread(CACHE.set, f"segments:{key}", (segments, language))
+        await asyncio.to_thread(CACHE.set, key, ("".join(s["text"] for s in segments), language))
+        await websocket.send_json({"done": True, "language": language or "unknown"})
+        await websocket.close()
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        # Si el cliente ya se fue, el envío del error también falla: ignorarlo
+        try:
+            if websocket.client_state == WebSocketState.CONNECTED:
+                await websocket.send_json({
+                    "error": "Error al transcribir el audio",
+                    "detail": str(e),
+                    "tip": "Asegúrate de que el archivo de audio no esté corrupto y sea válido"
+                })
+                await websocket.close(code=1011)
+        except Exception:
+            pass
+    finally:
+        if fd is not None:
+            os.close(fd)
 
 @app.get("/",
     summary="Información de la API",
@@ -237,12 +706,15 @@ async def root():
     return {
         "message": "API de Transcripción de Audio",
         "endpoints": {
-            "/transcribe": "POST - Transcribe un archivo de audio enviado directamente",
+            "/transcribe": "POST - Transcribe un archivo de audio enviado como formulario (multipart)",
+            "/transcribe/raw": "POST - Transcribe un archivo de audio enviado directamente",
             "/transcribe/url": "POST - Transcribe un archivo de audio desde una URL",
+            "/transcribe/stream": "WebSocket - Transcribe un archivo de audio enviando los segmentos a medida que se generan",
             "/": "GET - Esta información"
         },
         "instrucciones": {
-            "archivo_directo": "Envía el archivo de audio directamente como binary data en el body del request",
+            "archivo_formulario": "Envía el archivo de audio en el campo 'file' de un formulario multipart",
+            "archivo_directo": "Envía el archivo de audio directamente como binary data en el body del request a /transcribe/raw",
             "desde_url": "Envía un JSON con el formato: {'url': 'http://ejemplo.com/audio.mp3'}"
         }
     }
\ No newline at end of file